@@ -21,6 +21,9 @@ from scie_pants.pants_version import (
 )
 from scie_pants.ptex import Ptex
 
+# Pants runs on Python 3.9 from this version on and on Python 3.8 before it.
+PYTHON_3_9_PANTS_VERSION = Version("2.5")
+
 
 def prompt(message: str, default: bool) -> bool:
     raw_answer = input(f"{message} ({'Y/n' if default else 'N/y'}): ")
@@ -41,7 +44,21 @@ def prompt_for_pants_version(pants_config: Path) -> bool:
 def prompt_for_pants_config() -> Path | None:
     cwd = os.getcwd()
     buildroot = Path(cwd)
-    if shutil.which("git"):
+
+    # N.B.: We look for the root of the enclosing git repo ourselves to avoid spawning a git process
+    # in the common case. A `.git` file (as opposed to a directory) marks a worktree or submodule
+    # root, which is what `git rev-parse --show-toplevel` reports in those cases too.
+    git_root = next(
+        (
+            directory
+            for directory in (buildroot, *buildroot.parents)
+            if (directory / ".git").exists()
+        ),
+        None,
+    )
+    if git_root:
+        buildroot = git_root
+    elif shutil.which("git"):
         result = subprocess.run(
             args=["git", "rev-parse", "--show-toplevel"],
             stdout=subprocess.PIPE,
@@ -75,7 +92,7 @@ def main() -> NoReturn:
     if not env_file:
         fatal("Expected SCIE_BINDING_ENV to be set in the environment")
 
-    ptex = get_ptex(options)
+    ptex = get_ptex(options).with_cache_dir(base_dir / "http_cache")
 
     find_links_dir = base_dir / "find_links"
 
@@ -117,17 +134,21 @@ def main() -> NoReturn:
         fatal("Failed to configure a pants.toml")
 
     build_root = pants_config.parent
-    python = "python3.8" if version < Version("2.5") else "python3.9"
+    python = "python3.8" if version < PYTHON_3_9_PANTS_VERSION else "python3.9"
 
     for finalizer in finalizers:
         finalizer()
 
-    with open(env_file, "a") as fp:
-        print(f"FIND_LINKS={resolve_info.find_links}", file=fp)
-        print(f"PANTS_BUILDROOT_OVERRIDE={build_root}", file=fp)
-        print(f"PANTS_SHA_FIND_LINKS={resolve_info.pants_find_links_option(version)}", file=fp)
-        print(f"PANTS_VERSION={version}", file=fp)
-        print(f"PYTHON={python}", file=fp)
+    with open(env_file, "ab") as fp:
+        fp.write(
+            os.fsencode(
+                f"FIND_LINKS={resolve_info.find_links}\n"
+                f"PANTS_BUILDROOT_OVERRIDE={build_root}\n"
+                f"PANTS_SHA_FIND_LINKS={resolve_info.pants_find_links_option(version)}\n"
+                f"PANTS_VERSION={version}\n"
+                f"PYTHON={python}\n"
+            )
+        )
 
     sys.exit(0)
 
@@ -3,6 +3,7 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
 import subprocess
@@ -11,33 +12,35 @@ from argparse import ArgumentParser
 from pathlib import Path
 from typing import Iterable, NoReturn
 
-from packaging.version import Version
-
 from scie_pants.log import fatal, info, init_logging
 
 log = logging.getLogger(__name__)
 
 
-def install_pants(
+# All the Pants versions we support are released as platform-specific wheels (both to PyPI and to
+# binaries.pantsbuild.org); so we never want the installer to consider building Pants from an sdist.
+ONLY_BINARY_OPTIONS = ("--only-binary", "pantsbuild.pants")
+
+
+def install_pants_with_pip(
     venv_dir: Path, prompt: str, pants_requirements: Iterable[str], find_links: str | None
 ) -> None:
-    subprocess.run(
-        args=[
-            sys.executable,
-            "-m",
-            "venv",
-            "--clear",
-            "--prompt",
-            prompt,
-            str(venv_dir),
-        ],
-        check=True,
-    )
+    # N.B.: The venv module is only needed here; so we import it lazily to keep it off the venv
+    # re-use path.
+    import venv
+
+    # N.B.: We're already running under the Python we want the venv to use; so we create the venv
+    # in-process instead of paying for another interpreter startup via `python -m venv`.
+    venv.EnvBuilder(clear=True, symlinks=True, with_pip=True, prompt=prompt).create(str(venv_dir))
     python = venv_dir / "bin" / "python"
     install_log = venv_dir / "pants-install.log"
 
     find_links_options = ("--find-links", find_links) if find_links else ()
 
+    # N.B.: We configure Pip via the environment so that the settings apply uniformly to all Pip
+    # invocations. We also skip Pip's check for a newer version of itself since we pin it below.
+    pip_env = {**os.environ, "PIP_PROGRESS_BAR": "off", "PIP_DISABLE_PIP_VERSION_CHECK": "1"}
+
     def pip_install(*args: str) -> None:
         subprocess.run(
             args=[
@@ -49,9 +52,11 @@ def install_pants(
                 install_log,
                 "install",
                 "--quiet",
+                "--no-compile",
                 *find_links_options,
                 *args,
             ],
+            env=pip_env,
             check=True,
         )
 
@@ -63,14 +68,58 @@ def install_pants(
     # Also, we don't advance setuptools past 58 which drops support for the `setup` kwarg `use_2to3`
     # which Pants 1.x sdist dependencies (pystache) use.
     pip_install("-U", "pip==22.3.1", "setuptools<58", "wheel")
-    pip_install("--progress-bar", "off", *pants_requirements)
+    pip_install(*ONLY_BINARY_OPTIONS, *pants_requirements)
+
+
+def install_pants(
+    venv_dir: Path, prompt: str, pants_requirements: Iterable[str], find_links: str | None
+) -> bool:
+    pants_requirements = sorted(pants_requirements)
+
+    # N.B.: A venv is only stamped after a successful install; so a matching stamp means the venv
+    # is complete and usable as-is (this is common when a bindings dir is restored from a CI cache).
+    install_stamp = venv_dir / "pants_install.stamp"
+    install_fingerprint = hashlib.sha256(
+        "\n".join((sys.version, *pants_requirements)).encode()
+    ).hexdigest()
+    try:
+        if install_stamp.read_text() == install_fingerprint:
+            return False
+    except OSError:
+        pass
+
+    install_pants_with_pip(
+        venv_dir=venv_dir,
+        prompt=prompt,
+        pants_requirements=pants_requirements,
+        find_links=find_links,
+    )
+
+    # N.B.: Pip byte-compiles installed files serially; so we install without compiling and then
+    # compile the whole venv using all available cores. Just as with Pip, files that fail to
+    # compile are not fatal to the install.
+    subprocess.run(
+        args=[
+            str(venv_dir / "bin" / "python"),
+            "-I",
+            "-m",
+            "compileall",
+            "-qq",
+            "-j",
+            "0",
+            str(venv_dir / "lib"),
+        ]
+    )
+
+    install_stamp.write_text(install_fingerprint)
+    return True
 
 
 def main() -> NoReturn:
     parser = ArgumentParser()
-    parser.add_argument(
-        "--pants-version", type=Version, required=True, help="The Pants version to install"
-    )
+    # N.B.: The Pants version is passed to us already normalized by the configure binding; so we
+    # use it as-is and avoid importing `packaging` on the install path.
+    parser.add_argument("--pants-version", required=True, help="The Pants version to install")
     parser.add_argument(
         "--find-links",
         type=str,
@@ -105,16 +154,20 @@ def main() -> NoReturn:
         prompt = f"Pants {version}"
 
     info(f"Installing {' '.join(pants_requirements)} into a virtual environment at {venv_dir}")
-    install_pants(
+    if install_pants(
         venv_dir=venv_dir,
         prompt=prompt,
         pants_requirements=pants_requirements,
         find_links=options.find_links,
-    )
-    info(f"New virtual environment successfully created at {venv_dir}.")
+    ):
+        info(f"New virtual environment successfully created at {venv_dir}.")
+    else:
+        info(f"Re-using the existing virtual environment at {venv_dir}.")
 
-    with open(env_file, "a") as fp:
-        print(f"VIRTUAL_ENV={venv_dir}", file=fp)
+    # N.B.: We write bytes to get exactly one LF line ending and to round-trip any non-UTF-8 path
+    # bytes in the venv dir unchanged.
+    with open(env_file, "ab") as fp:
+        fp.write(os.fsencode(f"VIRTUAL_ENV={venv_dir}\n"))
 
     sys.exit(0)
 
@@ -8,7 +8,13 @@ from pathlib import Path
 from textwrap import dedent
 from typing import NoReturn
 
-from colors import green, red, yellow
+# N.B.: We color output by hand instead of using a colors library to keep third party imports off
+# the startup path. Output is only colored when stderr is a terminal.
+_COLOR = sys.stderr.isatty()
+_GREEN = "\x1b[32m" if _COLOR else ""
+_YELLOW = "\x1b[33m" if _COLOR else ""
+_RED = "\x1b[31m" if _COLOR else ""
+_RESET = "\x1b[0m" if _COLOR else ""
 
 
 def _log(message: str) -> None:
@@ -17,22 +23,22 @@ def _log(message: str) -> None:
 
 def info(message: str) -> None:
     logging.info(message)
-    _log(green(message))
+    _log(f"{_GREEN}{message}{_RESET}")
 
 
 def warn(message: str) -> None:
     logging.warning(message)
-    _log(yellow(message))
+    _log(f"{_YELLOW}{message}{_RESET}")
 
 
 def fatal(message: str) -> NoReturn:
     logging.critical(message)
-    sys.exit(red(message))
+    sys.exit(f"{_RED}{message}{_RESET}")
 
 
 def exception(message: str, exc_info=None) -> NoReturn:
     logging.exception(message, exc_info=exc_info)
-    sys.exit(red(message))
+    sys.exit(f"{_RED}{message}{_RESET}")
 
 
 def init_logging(base_dir: Path, log_name: str):
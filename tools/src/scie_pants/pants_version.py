@@ -7,22 +7,28 @@ import importlib.resources
 import json
 import logging
 import os
+import re
+import shutil
 import urllib.parse
 from dataclasses import dataclass
 from pathlib import Path
 from subprocess import CalledProcessError
-from typing import Callable, Iterator
-from xml.etree import ElementTree
+from typing import Callable
 
-import tomlkit
-from packaging.specifiers import SpecifierSet
 from packaging.version import Version
 
 from scie_pants.log import info, warn
-from scie_pants.ptex import Ptex
+from scie_pants.ptex import CACHE_FOREVER, Ptex
 
 log = logging.getLogger(__name__)
 
+# New stable Pants releases are cut at most about once a week; so we only re-check PyPI hourly.
+LATEST_STABLE_VERSION_TTL = 60 * 60
+
+
+# Pants 2.14.0, including all its pre-releases, uses `[python-repos] find_links` in place of `repos`.
+_PYTHON_REPOS_FIND_LINKS_VERSION = Version("2.14.0.dev0")
+
 
 @dataclass(frozen=True)
 class ResolveInfo:
@@ -36,11 +42,22 @@ class ResolveInfo:
         # binaries.pantsbuild.org S3 find-links bucket.
         operator = "-" if pants_version_selected == self.stable_version else "+"
         option_name = (
-            "repos"
-            if self.stable_version in SpecifierSet("<2.14.0", prereleases=True)
-            else "find-links"
+            "repos" if self.stable_version < _PYTHON_REPOS_FIND_LINKS_VERSION else "find-links"
         )
-        return f"--python-repos-{option_name}={operator}['{self.find_links}']"
+        # N.B.: Pants parses list option values as Python literals; so we use `repr` to correctly
+        # quote find-links URLs that contain quotes.
+        return f"--python-repos-{option_name}={operator}[{self.find_links!r}]"
+
+
+_URL_PATH_UNSAFE_BYTES = re.compile(rb"[^A-Za-z0-9_.~/-]")
+
+
+def _quote_url_path(path: str) -> str:
+    # N.B.: This is equivalent to `urllib.parse.quote(path)` but several times faster, which adds
+    # up over the up to 1000 keys a bucket listing can contain.
+    return _URL_PATH_UNSAFE_BYTES.sub(
+        lambda match: b"%%%02X" % match.group()[0], path.encode()
+    ).decode()
 
 
 def determine_find_links(
@@ -53,36 +70,64 @@ def determine_find_links(
     abbreviated_sha = sha[:8]
     sha_version = Version(f"{pants_version}+git{abbreviated_sha}")
 
-    list_bucket_results = ElementTree.fromstring(
-        ptex.fetch_text(f"https://binaries.pantsbuild.org?prefix=wheels/3rdparty/{sha}")
+    # N.B.: A release tag and a `--pants-sha` of the same commit resolve to the same version and
+    # sha; so we keep the page that includes Pants distributions separate.
+    find_links_file = (
+        find_links_dir
+        / pants_version
+        / abbreviated_sha
+        / ("pantsbuild.pants.html" if include_pants_distributions_in_findlinks else "index.html")
     )
 
-    find_links_file = find_links_dir / pants_version / abbreviated_sha / "index.html"
+    def resolve_info(page: Path) -> ResolveInfo:
+        return ResolveInfo(
+            stable_version=Version(pants_version),
+            sha_version=sha_version,
+            find_links=f"file://{page}",
+        )
+
+    # N.B.: The find-links page is only ever moved into place once complete, and the wheels
+    # published for a given sha do not change; so an existing page can be re-used as-is.
+    if find_links_file.exists():
+        log.debug(f"Re-using find-links page at {find_links_file}.")
+        return resolve_info(find_links_file)
+
+    urls = [f"https://binaries.pantsbuild.org?prefix=wheels/3rdparty/{sha}"]
+    if include_pants_distributions_in_findlinks:
+        urls.append(
+            "https://binaries.pantsbuild.org/wheels/pantsbuild.pants/"
+            f"{sha}/{urllib.parse.quote(str(sha_version))}/index.html"
+        )
+    bucket_listing, *pantsbuild_pants_find_links = ptex.fetch_many(*urls)
+
+    # N.B.: ElementTree is only needed when a find-links page must be generated; so we import it
+    # lazily.
+    from xml.etree import ElementTree
+
+    list_bucket_results = ElementTree.fromstring(bucket_listing)
+    # N.B.: S3 bucket listings use a default namespace. Although the URI is apparently stable,
+    # we decouple from it with the wildcard.
+    bucket_paths = [str(key.text) for key in list_bucket_results.findall("./{*}Contents/{*}Key")]
+
+    # N.B.: S3 answers a prefix with no uploads yet with an empty listing, and a listing is capped
+    # at 1000 keys. We still use an empty or truncated listing for this run, but we write it to a
+    # page that is re-generated on every run so that we pick up the full listing once available.
+    if not bucket_paths or list_bucket_results.findtext("./{*}IsTruncated") == "true":
+        log.debug(f"The bucket listing for {sha} is incomplete; not re-using its find-links page.")
+        find_links_file = find_links_file.with_name(f"partial-{find_links_file.name}")
+
     find_links_file.parent.mkdir(parents=True, exist_ok=True)
-    find_links_file.unlink(missing_ok=True)
-    with find_links_file.open("wb") as fp:
-        # N.B.: S3 bucket listings use a default namespace. Although the URI is apparently stable,
-        # we decouple from it with the wildcard.
-        for key in list_bucket_results.findall("./{*}Contents/{*}Key"):
-            bucket_path = str(key.text)
-            fp.write(
-                f'<a href="https://binaries.pantsbuild.org/{urllib.parse.quote(bucket_path)}">'
-                f"{os.path.basename(bucket_path)}"
-                f"</a>{os.linesep}".encode()
-            )
-        fp.flush()
-        if include_pants_distributions_in_findlinks:
-            pantsbuild_pants_find_links = (
-                "https://binaries.pantsbuild.org/wheels/pantsbuild.pants/"
-                f"{sha}/{urllib.parse.quote(str(sha_version))}/index.html"
-            )
-            ptex.fetch_to_fp(pantsbuild_pants_find_links, fp)
+    tmp_find_links_file = find_links_file.with_name(f"{find_links_file.name}.{os.getpid()}.tmp")
+    links = [
+        f'<a href="https://binaries.pantsbuild.org/{_quote_url_path(bucket_path)}">'
+        f"{os.path.basename(bucket_path)}"
+        f"</a>{os.linesep}".encode()
+        for bucket_path in bucket_paths
+    ]
+    tmp_find_links_file.write_bytes(b"".join((*links, *pantsbuild_pants_find_links)))
+    tmp_find_links_file.replace(find_links_file)
 
-    return ResolveInfo(
-        stable_version=Version(pants_version),
-        sha_version=sha_version,
-        find_links=f"file://{find_links_file}",
-    )
+    return resolve_info(find_links_file)
 
 
 def determine_tag_version(
@@ -94,7 +139,7 @@ def determine_tag_version(
     # git tag --list release_* | \
     #   xargs -I@ bash -c 'jq --arg T @ --arg C $(git rev-parse @^{commit}) -n "{(\$T): \$C}"' | \
     #   jq -s 'add' > pants_release_tags.json
-    tags = json.loads(importlib.resources.read_text("scie_pants", "pants_release_tags.json"))
+    tags = json.loads(importlib.resources.read_binary("scie_pants", "pants_release_tags.json"))
     commit_sha = tags.get(tag, "")
 
     if not commit_sha:
@@ -104,7 +149,7 @@ def determine_tag_version(
             f"at {mapping_file_url} next."
         )
         try:
-            commit_sha = ptex.fetch_text(mapping_file_url).strip()
+            commit_sha = ptex.fetch_cached_text(mapping_file_url, ttl=CACHE_FOREVER).strip()
         except CalledProcessError as e:
             log.debug(
                 f"Failed to look up the commit for Pants {tag} at binaries.pantsbuild.org, trying "
@@ -114,16 +159,28 @@ def determine_tag_version(
     # The GitHub API requests are rate limited to 60 per hour un-authenticated; so we guard
     # these with the database of old releases and then the binaries.pantsbuild.org lookups above.
     if not commit_sha:
+        # N.B.: We use the exact-match `git/ref` endpoint since the `git/refs` endpoint falls back to
+        # a prefix match that returns a list of refs when the tag does not exist (yet); a response
+        # we must not cache forever.
         github_api_url = (
-            f"https://api.github.com/repos/pantsbuild/pants/git/refs/tags/{urllib.parse.quote(tag)}"
+            f"https://api.github.com/repos/pantsbuild/pants/git/ref/tags/{urllib.parse.quote(tag)}"
         )
         headers = (
             {"Authorization": f"Bearer {github_api_bearer_token}"}
             if github_api_bearer_token
             else {}
         )
-        github_api_tag_url = ptex.fetch_json(github_api_url, **headers)["object"]["url"]
-        commit_sha = ptex.fetch_json(github_api_tag_url, **headers)["object"]["sha"]
+        # N.B.: Release tags never move; so we cache these responses forever. A lightweight tag
+        # points directly at its commit and only an annotated tag needs to be dereferenced.
+        github_api_tag_object = ptex.fetch_cached_json(
+            github_api_url, ttl=CACHE_FOREVER, **headers
+        )["object"]
+        if github_api_tag_object["type"] == "commit":
+            commit_sha = github_api_tag_object["sha"]
+        else:
+            commit_sha = ptex.fetch_cached_json(
+                github_api_tag_object["url"], ttl=CACHE_FOREVER, **headers
+            )["object"]["sha"]
 
     return determine_find_links(
         ptex,
@@ -138,35 +195,89 @@ def determine_sha_version(ptex: Ptex, sha: str, find_links_dir: Path) -> Resolve
     version_file_url = (
         f"https://raw.githubusercontent.com/pantsbuild/pants/{sha}/src/python/pants/VERSION"
     )
-    pants_version = ptex.fetch_text(version_file_url).strip()
+    pants_version = ptex.fetch_cached_text(version_file_url, ttl=CACHE_FOREVER).strip()
     return determine_find_links(
         ptex, pants_version, sha, find_links_dir, include_pants_distributions_in_findlinks=True
     )
 
 
+_GLOBAL_SECTION_HEADER = re.compile(r"^[ \t]*\[[ \t]*GLOBAL[ \t]*\][ \t]*(?:#.*)?$", re.MULTILINE)
+_PANTS_VERSION_KEY = re.compile(r"^[ \t]*pants_version[ \t]*=", re.MULTILINE)
+
+
+def _splice_pants_version(config: str, pants_version: str) -> str | None:
+    # We handle the common cases of a `pants.toml` with no `[GLOBAL]` section or with a plain
+    # `[GLOBAL]` section that lacks a `pants_version` with a textual edit. Anything else (an existing
+    # `pants_version`, dotted `GLOBAL.*` keys, etc.) returns None to signal a full TOML round-trip is
+    # needed.
+    if _PANTS_VERSION_KEY.search(config):
+        return None
+
+    global_section_headers = list(_GLOBAL_SECTION_HEADER.finditer(config))
+    if config.count("GLOBAL") != len(global_section_headers):
+        return None
+
+    pants_version_entry = f'pants_version = "{pants_version}"'
+    if not global_section_headers:
+        global_section = f"[GLOBAL]\n{pants_version_entry}\n"
+        return f"{config.rstrip()}\n\n{global_section}" if config.strip() else global_section
+
+    if len(global_section_headers) > 1:
+        return None
+    insert_at = global_section_headers[0].end()
+    return f"{config[:insert_at]}\n{pants_version_entry}{config[insert_at:]}"
+
+
+def configure_pants_version(pants_config: Path, pants_version: str) -> None:
+    if not pants_config.exists():
+        info(f"Creating {pants_config} and configuring it to use Pants {pants_version}")
+        pants_config.write_text(f'[GLOBAL]\npants_version = "{pants_version}"\n')
+        return
+
+    info(f'Setting [GLOBAL] pants_version = "{pants_version}" in {pants_config}')
+    config = pants_config.read_text()
+    new_config = _splice_pants_version(config, pants_version)
+    if new_config is None:
+        import tomlkit
+
+        document = tomlkit.loads(config)
+        global_section = document.setdefault("GLOBAL", {})
+        global_section["pants_version"] = pants_version
+        new_config = tomlkit.dumps(document)
+
+    backup = pants_config.with_name(f"{pants_config.name}.bak")
+    warn(f"Backing up {pants_config} to {backup}")
+    # N.B.: We hard link the backup and atomically replace the original with the new config so
+    # that an interruption at any point leaves a valid `pants.toml` in place.
+    if backup.exists():
+        backup.unlink()
+    try:
+        os.link(pants_config, backup)
+    except OSError:
+        shutil.copy2(pants_config, backup)
+    new_pants_config = pants_config.with_name(f"{pants_config.name}.{os.getpid()}.new")
+    try:
+        with new_pants_config.open("w") as fp:
+            fp.write(new_config)
+            # N.B.: We flush the new config to disk before renaming it into place so that a crash
+            # cannot leave behind a renamed but empty `pants.toml`.
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(new_pants_config, pants_config)
+    finally:
+        new_pants_config.unlink(missing_ok=True)
+
+
 def determine_latest_stable_version(
     ptex: Ptex, pants_config: Path, find_links_dir: Path, github_api_bearer_token: str | None = None
 ) -> tuple[Callable[[], None], ResolveInfo]:
     info(f"Fetching latest stable Pants version since none is configured")
-    pants_version = ptex.fetch_json("https://pypi.org/pypi/pantsbuild.pants/json")["info"][
-        "version"
-    ]
+    pants_version = ptex.fetch_cached_json(
+        "https://pypi.org/pypi/pantsbuild.pants/json", ttl=LATEST_STABLE_VERSION_TTL
+    )["info"]["version"]
 
     def configure_version():
-        backup = None
-        if pants_config.exists():
-            info(f'Setting [GLOBAL] pants_version = "{pants_version}" in {pants_config}')
-            config = tomlkit.loads(pants_config.read_text())
-            backup = f"{pants_config}.bak"
-        else:
-            info(f"Creating {pants_config} and configuring it to use Pants {pants_version}")
-            config = tomlkit.document()
-        global_section = config.setdefault("GLOBAL", {})
-        global_section["pants_version"] = pants_version
-        if backup:
-            warn(f"Backing up {pants_config} to {backup}")
-            pants_config.replace(backup)
-        pants_config.write_text(tomlkit.dumps(config))
+        configure_pants_version(pants_config, pants_version)
 
     return configure_version, determine_tag_version(
         ptex, pants_version, find_links_dir, github_api_bearer_token
@@ -4,12 +4,21 @@
 from __future__ import annotations
 
 import argparse
+import dataclasses
+import hashlib
 import json
+import math
+import os
 import subprocess
+import time
 from argparse import ArgumentParser, Namespace
 from dataclasses import dataclass
-from subprocess import CompletedProcess
-from typing import Any, BinaryIO, Callable, cast
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import IO, Any, BinaryIO, Callable, Mapping, cast
+
+# A cache TTL for URLs whose content never changes; e.g.: URLs that embed a commit sha.
+CACHE_FOREVER = math.inf
 
 
 @dataclass(frozen=True)
@@ -31,19 +40,100 @@ class Ptex:
         return lambda options: cast(Ptex, options.ptex)
 
     _exe: str
+    _cache_dir: Path | None = None
+
+    def with_cache_dir(self, cache_dir: Path) -> Ptex:
+        return dataclasses.replace(self, _cache_dir=cache_dir)
 
-    def _fetch(self, url: str, stdout: int, **headers: str) -> CompletedProcess:
+    # N.B.: We launch ptex with `close_fds=False` everywhere below since that lets CPython spawn it
+    # with `posix_spawn` instead of `fork` + `exec`, avoiding copying our page tables. File
+    # descriptors opened by Python are non-inheritable (PEP 446); so this leaks nothing to ptex.
+    def _args(self, url: str, headers: Mapping[str, str]) -> list[str]:
         args = [self._exe]
         for header, value in headers.items():
             args.extend(("-H", f"{header}: {value}"))
         args.append(url)
-        return subprocess.run(args=args, stdout=stdout, check=True)
+        return args
+
+    def _cache_file(self, url: str, ttl: float | None) -> Path | None:
+        if ttl is None or self._cache_dir is None:
+            return None
+        return self._cache_dir / hashlib.sha256(url.encode()).hexdigest()
+
+    @staticmethod
+    def _read_cache(cache_file: Path | None, ttl: float | None) -> bytes | None:
+        # N.B.: The ptex binary does not expose response headers or status codes; so we cannot issue
+        # conditional requests and instead rely on the caller to know how long a response is good
+        # for.
+        if cache_file is None or ttl is None:
+            return None
+        try:
+            if time.time() - cache_file.stat().st_mtime < ttl:
+                return cache_file.read_bytes()
+        except OSError:
+            pass
+        return None
+
+    @staticmethod
+    def _write_cache(cache_file: Path | None, content: bytes) -> None:
+        if cache_file is None:
+            return
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        tmp_file.write_bytes(content)
+        tmp_file.replace(cache_file)
+
+    def _fetch_bytes(self, url: str, headers: Mapping[str, str], ttl: float | None = None) -> bytes:
+        cache_file = self._cache_file(url, ttl)
+        content = self._read_cache(cache_file, ttl)
+        if content is None:
+            content = subprocess.check_output(args=self._args(url, headers), close_fds=False)
+            self._write_cache(cache_file, content)
+        return content
 
     def fetch_json(self, url: str, **headers: str) -> Any:
-        return json.loads(self._fetch(url, stdout=subprocess.PIPE, **headers).stdout)
+        return json.loads(self._fetch_bytes(url, headers))
+
+    def fetch_cached_json(self, url: str, ttl: float, **headers: str) -> Any:
+        return json.loads(self._fetch_bytes(url, headers, ttl=ttl))
 
     def fetch_text(self, url: str, **headers: str) -> str:
-        return self._fetch(url, stdout=subprocess.PIPE, **headers).stdout.decode()
+        return self._fetch_bytes(url, headers).decode()
+
+    def fetch_cached_text(self, url: str, ttl: float, **headers: str) -> str:
+        return self._fetch_bytes(url, headers, ttl=ttl).decode()
+
+    def fetch_many(self, *urls: str, **headers: str) -> list[bytes]:
+        # N.B.: The ptex binary fetches a single URL per invocation; so we launch all the fetches
+        # up front and then collect their results to overlap the network round trips.
+        processes = [
+            subprocess.Popen(args=self._args(url, headers), stdout=subprocess.PIPE, close_fds=False)
+            for url in urls
+        ]
+        try:
+            results = []
+            for process in processes:
+                stdout, _ = process.communicate()
+                if process.returncode != 0:
+                    raise CalledProcessError(process.returncode, process.args, output=stdout)
+                results.append(stdout)
+            return results
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
 
-    def fetch_to_fp(self, url: str, fp: BinaryIO, **headers: str) -> None:
-        self._fetch(url, stdout=fp.fileno(), **headers)
+    def fetch_to_fp_with_sha256(self, url: str, fp: BinaryIO, **headers: str) -> str:
+        # N.B.: We hash the download as it streams through to `fp` to avoid reading it back.
+        digest = hashlib.sha256()
+        with subprocess.Popen(
+            args=self._args(url, headers), stdout=subprocess.PIPE, close_fds=False
+        ) as process:
+            stdout = cast(IO[bytes], process.stdout)
+            for chunk in iter(lambda: stdout.read(1024 * 1024), b""):
+                digest.update(chunk)
+                fp.write(chunk)
+        if process.returncode != 0:
+            raise CalledProcessError(process.returncode, process.args)
+        return digest.hexdigest()
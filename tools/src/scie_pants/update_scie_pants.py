@@ -5,8 +5,6 @@ from __future__ import annotations
 
 import argparse
 import atexit
-import hashlib
-import io
 import json
 import logging
 import os
@@ -50,16 +48,14 @@ class Release:
     ) -> Release | None:
         binary_name = f"{BINARY_NAME}-{platform}{EXE_EXTENSION}"
         binary_sha256_name = f"{binary_name}.sha256"
-        binary_url = None
-        binary_sha256_url = None
-        for asset in release_data.get("assets", []):
-            name = asset.get("name")
-            if binary_name == name:
-                binary_url = asset.get("browser_download_url")
-            elif binary_sha256_name == name:
-                binary_sha256_url = asset.get("browser_download_url")
-            if binary_url and binary_sha256_url:
-                return cls(version, binary_name, binary_url, binary_sha256_url)
+        download_urls = {
+            asset.get("name"): asset.get("browser_download_url")
+            for asset in release_data.get("assets", [])
+        }
+        binary_url = download_urls.get(binary_name)
+        binary_sha256_url = download_urls.get(binary_sha256_name)
+        if binary_url and binary_sha256_url:
+            return cls(version, binary_name, binary_url, binary_sha256_url)
         log.debug(
             f"No release for {BINARY_NAME} {version} compatible with {platform} was found in: "
             f"{json.dumps(release_data, indent=2)}"
@@ -131,9 +127,7 @@ def find_latest_production_release(
         )
         return None
 
-    # We want the highest version; so this needs to be a reverse sort.
-    latest_releases.sort(reverse=True, key=lambda rel: rel.version)
-    return latest_releases[0]
+    return max(latest_releases, key=lambda rel: rel.version)
 
 
 def install_release(ptex: Ptex, release: Release, scie: Path) -> Path:
@@ -147,14 +141,7 @@ def install_release(ptex: Ptex, release: Release, scie: Path) -> Path:
 
     binary = download_dir / release.file_name
     with open(binary, "wb") as fp:
-        ptex.fetch_to_fp(release.binary_url, fp)
-
-    # TODO(John Sirois): Ideally this would not be 2-pass and we'd hash the download stream inline.
-    digest = hashlib.sha256()
-    with open(binary, "rb") as fp:
-        for chunk in iter(lambda: fp.read(io.DEFAULT_BUFFER_SIZE), b""):
-            digest.update(chunk)
-    actual_sha256 = digest.hexdigest()
+        actual_sha256 = ptex.fetch_to_fp_with_sha256(release.binary_url, fp)
     if expected_sha256 != actual_sha256:
         eol = os.linesep
         raise ValueError(
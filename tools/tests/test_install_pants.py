@@ -0,0 +1,68 @@
+# Copyright 2022 Pants project contributors.
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import pytest
+
+from scie_pants import install_pants
+
+
+@pytest.fixture
+def installs(monkeypatch: pytest.MonkeyPatch) -> List[List[str]]:
+    installs: List[List[str]] = []
+
+    def fake_install_pants_with_pip(
+        venv_dir: Path, prompt: str, pants_requirements: Iterable[str], find_links: Optional[str]
+    ) -> None:
+        installs.append(list(pants_requirements))
+        (venv_dir / "bin").mkdir(parents=True, exist_ok=True)
+        (venv_dir / "lib").mkdir(exist_ok=True)
+        python = venv_dir / "bin" / "python"
+        if not python.exists():
+            os.symlink(sys.executable, python)
+
+    monkeypatch.setattr(install_pants, "install_pants_with_pip", fake_install_pants_with_pip)
+    return installs
+
+
+def test_install_pants_reuses_stamped_venv(tmp_path: Path, installs: List[List[str]]) -> None:
+    venv_dir = tmp_path / "venvs" / "2.14.0"
+
+    def install(*pants_requirements: str) -> bool:
+        return install_pants.install_pants(
+            venv_dir=venv_dir,
+            prompt="Pants 2.14.0",
+            pants_requirements=pants_requirements,
+            find_links=None,
+        )
+
+    assert install("pantsbuild.pants==2.14.0") is True
+    assert install("pantsbuild.pants==2.14.0") is False
+    assert [["pantsbuild.pants==2.14.0"]] == installs
+
+    # A venv with different requirements must be re-installed.
+    assert install("pantsbuild.pants==2.14.0", "debugpy==1.6.0") is True
+    assert install("debugpy==1.6.0", "pantsbuild.pants==2.14.0") is False
+    assert [
+        ["pantsbuild.pants==2.14.0"],
+        ["debugpy==1.6.0", "pantsbuild.pants==2.14.0"],
+    ] == installs
+
+
+def test_install_pants_unstamped_venv(tmp_path: Path, installs: List[List[str]]) -> None:
+    # A venv left behind by an interrupted install has no stamp and must be re-installed.
+    venv_dir = tmp_path / "venvs" / "2.14.0"
+    (venv_dir / "bin").mkdir(parents=True)
+
+    assert install_pants.install_pants(
+        venv_dir=venv_dir,
+        prompt="Pants 2.14.0",
+        pants_requirements=["pantsbuild.pants==2.14.0"],
+        find_links=None,
+    )
+    assert [["pantsbuild.pants==2.14.0"]] == installs
+    assert (venv_dir / "pants_install.stamp").is_file()
@@ -0,0 +1,293 @@
+# Copyright 2022 Pants project contributors.
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+import json
+import os
+from pathlib import Path
+from subprocess import CalledProcessError
+from textwrap import dedent
+from typing import Any, Dict, List, cast
+
+import pytest
+from packaging.version import Version
+
+from scie_pants.pants_version import (
+    ResolveInfo,
+    configure_pants_version,
+    determine_find_links,
+    determine_tag_version,
+)
+from scie_pants.ptex import Ptex
+
+
+def test_configure_pants_version_new_config(tmp_path: Path) -> None:
+    pants_config = tmp_path / "pants.toml"
+    configure_pants_version(pants_config, "2.14.0")
+    assert '[GLOBAL]\npants_version = "2.14.0"\n' == pants_config.read_text()
+    assert not (tmp_path / "pants.toml.bak").exists()
+
+
+def test_configure_pants_version_no_global_section(tmp_path: Path) -> None:
+    pants_config = tmp_path / "pants.toml"
+    original = dedent(
+        """\
+        # Pants config.
+        [python]
+        interpreter_constraints = ["==3.9.*"]
+        """
+    )
+    pants_config.write_text(original)
+    configure_pants_version(pants_config, "2.14.0")
+    assert (
+        dedent(
+            """\
+            # Pants config.
+            [python]
+            interpreter_constraints = ["==3.9.*"]
+
+            [GLOBAL]
+            pants_version = "2.14.0"
+            """
+        )
+        == pants_config.read_text()
+    )
+    assert original == (tmp_path / "pants.toml.bak").read_text()
+
+
+def test_configure_pants_version_existing_global_section(tmp_path: Path) -> None:
+    pants_config = tmp_path / "pants.toml"
+    pants_config.write_text(
+        dedent(
+            """\
+            [GLOBAL]  # The global options.
+            backend_packages = [
+                "pants.backend.python",
+            ]
+            """
+        )
+    )
+    configure_pants_version(pants_config, "2.14.0")
+    assert (
+        dedent(
+            """\
+            [GLOBAL]  # The global options.
+            pants_version = "2.14.0"
+            backend_packages = [
+                "pants.backend.python",
+            ]
+            """
+        )
+        == pants_config.read_text()
+    )
+
+
+def test_configure_pants_version_round_trip(tmp_path: Path) -> None:
+    pants_config = tmp_path / "pants.toml"
+    pants_config.write_text(
+        dedent(
+            """\
+            # Keep me.
+            GLOBAL.backend_packages = ["pants.backend.python"]
+            """
+        )
+    )
+    configure_pants_version(pants_config, "2.14.0")
+    config = pants_config.read_text()
+    assert config.startswith("# Keep me.\n")
+    assert 'pants_version = "2.14.0"' in config
+
+
+def test_configure_pants_version_replaces_stale_backup(tmp_path: Path) -> None:
+    pants_config = tmp_path / "pants.toml"
+    pants_config.write_text("[python]\n")
+    backup = tmp_path / "pants.toml.bak"
+    backup.write_text("stale")
+    configure_pants_version(pants_config, "2.14.0")
+    assert '[python]\n\n[GLOBAL]\npants_version = "2.14.0"\n' == pants_config.read_text()
+    assert "[python]\n" == backup.read_text()
+    assert {"pants.toml", "pants.toml.bak"} == {path.name for path in tmp_path.iterdir()}
+
+
+def test_configure_pants_version_write_failure(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def failing_fsync(fd: int) -> None:
+        raise OSError("Disk full.")
+
+    monkeypatch.setattr(os, "fsync", failing_fsync)
+
+    pants_config = tmp_path / "pants.toml"
+    pants_config.write_text("[python]\n")
+    with pytest.raises(OSError, match="Disk full."):
+        configure_pants_version(pants_config, "2.14.0")
+    assert "[python]\n" == pants_config.read_text()
+    assert {"pants.toml", "pants.toml.bak"} == {path.name for path in tmp_path.iterdir()}
+
+
+def test_pants_find_links_option() -> None:
+    def option(stable_version: str) -> str:
+        resolve_info = ResolveInfo(
+            stable_version=Version(stable_version),
+            sha_version=Version(f"{stable_version}+gitabcd1234"),
+            find_links="file:///find-links/index.html",
+        )
+        return resolve_info.pants_find_links_option(Version(stable_version))
+
+    assert "--python-repos-repos=-['file:///find-links/index.html']" == option("2.13.1rc2")
+    assert "--python-repos-find-links=-['file:///find-links/index.html']" == option("2.14.0.dev5")
+    assert "--python-repos-find-links=-['file:///find-links/index.html']" == option("2.14.0")
+
+
+def test_pants_find_links_option_quoting() -> None:
+    resolve_info = ResolveInfo(
+        stable_version=Version("2.14.0"),
+        sha_version=Version("2.14.0+gitabcd1234"),
+        find_links="file:///Users/o'brien/find-links/index.html",
+    )
+    assert (
+        """--python-repos-find-links=+["file:///Users/o'brien/find-links/index.html"]"""
+        == resolve_info.pants_find_links_option(Version("2.14.0+gitabcd1234"))
+    )
+
+
+SHA = "0123456789abcdef0123456789abcdef01234567"
+BUCKET_URL = f"https://binaries.pantsbuild.org?prefix=wheels/3rdparty/{SHA}"
+PANTS_URL = (
+    f"https://binaries.pantsbuild.org/wheels/pantsbuild.pants/{SHA}/2.14.0%2Bgit{SHA[:8]}/"
+    "index.html"
+)
+
+
+class FakePtex:
+    def __init__(self, responses: Dict[str, bytes]) -> None:
+        self.responses = responses
+        self.fetches: List[str] = []
+
+    def _fetch(self, url: str) -> bytes:
+        self.fetches.append(url)
+        if url not in self.responses:
+            raise CalledProcessError(1, ["ptex", url])
+        return self.responses[url]
+
+    def fetch_cached_text(self, url: str, ttl: float, **headers: str) -> str:
+        return self._fetch(url).decode()
+
+    def fetch_cached_json(self, url: str, ttl: float, **headers: str) -> Any:
+        return json.loads(self._fetch(url))
+
+    def fetch_many(self, *urls: str, **headers: str) -> List[bytes]:
+        return [self._fetch(url) for url in urls]
+
+
+def bucket_listing(*keys: str, truncated: bool = False) -> bytes:
+    contents = "".join(f"<Contents><Key>{key}</Key></Contents>" for key in keys)
+    return (
+        '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+        f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+        f"{contents}"
+        "</ListBucketResult>"
+    ).encode()
+
+
+def find_links(
+    ptex: FakePtex, find_links_dir: Path, include_pants_distributions_in_findlinks: bool = False
+) -> ResolveInfo:
+    return determine_find_links(
+        cast(Ptex, ptex),
+        "2.14.0",
+        SHA,
+        find_links_dir,
+        include_pants_distributions_in_findlinks=include_pants_distributions_in_findlinks,
+    )
+
+
+def test_determine_find_links_reuses_complete_page(tmp_path: Path) -> None:
+    key = f"wheels/3rdparty/{SHA}/foo-1.0-py3-none-any.whl"
+    ptex = FakePtex({BUCKET_URL: bucket_listing(key)})
+
+    resolve_info = find_links(ptex, tmp_path)
+    page = tmp_path / "2.14.0" / SHA[:8] / "index.html"
+    assert f"file://{page}" == resolve_info.find_links
+    assert (
+        f'<a href="https://binaries.pantsbuild.org/{key}">foo-1.0-py3-none-any.whl</a>{os.linesep}'
+        == page.read_text()
+    )
+
+    assert resolve_info == find_links(ptex, tmp_path)
+    assert [BUCKET_URL] == ptex.fetches
+
+
+def test_determine_find_links_regenerates_incomplete_page(tmp_path: Path) -> None:
+    ptex = FakePtex({BUCKET_URL: bucket_listing()})
+
+    resolve_info = find_links(ptex, tmp_path)
+    page = tmp_path / "2.14.0" / SHA[:8] / "partial-index.html"
+    assert f"file://{page}" == resolve_info.find_links
+    assert "" == page.read_text()
+
+    key = f"wheels/3rdparty/{SHA}/foo-1.0-py3-none-any.whl"
+    ptex.responses[BUCKET_URL] = bucket_listing(key, truncated=True)
+    assert resolve_info == find_links(ptex, tmp_path)
+    assert key in page.read_text()
+
+    ptex.responses[BUCKET_URL] = bucket_listing(key)
+    resolve_info = find_links(ptex, tmp_path)
+    assert f"file://{page.with_name('index.html')}" == resolve_info.find_links
+    assert [BUCKET_URL] * 3 == ptex.fetches
+
+
+def test_determine_find_links_regenerates_incomplete_page_with_pants(tmp_path: Path) -> None:
+    ptex = FakePtex({BUCKET_URL: bucket_listing(), PANTS_URL: b""})
+
+    resolve_info = find_links(ptex, tmp_path, include_pants_distributions_in_findlinks=True)
+    page = tmp_path / "2.14.0" / SHA[:8] / "partial-pantsbuild.pants.html"
+    assert f"file://{page}" == resolve_info.find_links
+    assert "" == page.read_text()
+
+    # Both pages are fetched afresh once the uploads for the sha complete.
+    key = f"wheels/3rdparty/{SHA}/foo-1.0-py3-none-any.whl"
+    ptex.responses[BUCKET_URL] = bucket_listing(key)
+    pants_link = '<a href="pantsbuild.pants-2.14.0+git01234567-py3-none-any.whl">pants</a>\n'
+    ptex.responses[PANTS_URL] = pants_link.encode()
+    resolve_info = find_links(ptex, tmp_path, include_pants_distributions_in_findlinks=True)
+    page = page.with_name("pantsbuild.pants.html")
+    assert f"file://{page}" == resolve_info.find_links
+    assert key in page.read_text()
+    assert page.read_text().endswith(pants_link)
+    assert [BUCKET_URL, PANTS_URL] * 2 == ptex.fetches
+
+
+MAPPING_URL = "https://binaries.pantsbuild.org/tags/pantsbuild.pants/release_2.99.0"
+TAG_REF_URL = "https://api.github.com/repos/pantsbuild/pants/git/ref/tags/release_2.99.0"
+TAG_OBJECT_URL = f"https://api.github.com/repos/pantsbuild/pants/git/tags/{'f' * 40}"
+
+
+def tag_version(ptex: FakePtex, find_links_dir: Path) -> ResolveInfo:
+    # N.B.: Pants 2.99.0 is not in the bundled tag database and the FakePtex has no mapping file
+    # for it; so its commit can only be found via the GitHub API.
+    return determine_tag_version(cast(Ptex, ptex), "2.99.0", find_links_dir)
+
+
+def test_determine_tag_version_lightweight_tag(tmp_path: Path) -> None:
+    ref = {"object": {"type": "commit", "sha": SHA, "url": "unused"}}
+    ptex = FakePtex({TAG_REF_URL: json.dumps(ref).encode(), BUCKET_URL: bucket_listing()})
+
+    resolve_info = tag_version(ptex, tmp_path)
+    assert Version(f"2.99.0+git{SHA[:8]}") == resolve_info.sha_version
+    assert [MAPPING_URL, TAG_REF_URL, BUCKET_URL] == ptex.fetches
+
+
+def test_determine_tag_version_annotated_tag(tmp_path: Path) -> None:
+    ref = {"object": {"type": "tag", "sha": "f" * 40, "url": TAG_OBJECT_URL}}
+    tag = {"object": {"type": "commit", "sha": SHA}}
+    ptex = FakePtex(
+        {
+            TAG_REF_URL: json.dumps(ref).encode(),
+            TAG_OBJECT_URL: json.dumps(tag).encode(),
+            BUCKET_URL: bucket_listing(),
+        }
+    )
+
+    resolve_info = tag_version(ptex, tmp_path)
+    assert Version(f"2.99.0+git{SHA[:8]}") == resolve_info.sha_version
+    assert [MAPPING_URL, TAG_REF_URL, TAG_OBJECT_URL, BUCKET_URL] == ptex.fetches
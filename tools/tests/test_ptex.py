@@ -0,0 +1,138 @@
+# Copyright 2022 Pants project contributors.
+# Licensed under the Apache License, Version 2.0 (see LICENSE).
+
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+from pathlib import Path
+from subprocess import CalledProcessError
+from textwrap import dedent
+from typing import List
+
+import pytest
+
+from scie_pants.ptex import CACHE_FOREVER, Ptex
+
+
+@pytest.fixture
+def fetch_log(tmp_path: Path) -> Path:
+    return tmp_path / "fetches.log"
+
+
+@pytest.fixture
+def ptex(tmp_path: Path, fetch_log: Path) -> Ptex:
+    # N.B.: This stands in for the ptex binary: it records each URL fetched and emits a body that
+    # identifies the fetch; so tests can tell fresh fetches from cache hits.
+    ptex_exe = tmp_path / "ptex"
+    ptex_exe.write_text(
+        dedent(
+            f"""\
+            #!{sys.executable}
+            import sys
+            import time
+
+            url = sys.argv[-1]
+            with open({str(fetch_log)!r}, "a") as fp:
+                print(url, file=fp)
+            with open({str(fetch_log)!r}) as fp:
+                count = len(fp.readlines())
+            if url.endswith("/fail"):
+                sys.exit(1)
+            if url.endswith("/hang"):
+                time.sleep(60)
+            sys.stdout.write(f"{{url}} #{{count}}")
+            """
+        )
+    )
+    ptex_exe.chmod(0o755)
+    return Ptex.from_exe(str(ptex_exe)).with_cache_dir(tmp_path / "cache")
+
+
+def fetches(fetch_log: Path) -> List[str]:
+    return fetch_log.read_text().splitlines() if fetch_log.exists() else []
+
+
+def expire_cache(ptex: Ptex, age: float) -> None:
+    assert ptex._cache_dir is not None
+    for cache_file in ptex._cache_dir.iterdir():
+        stat = cache_file.stat()
+        os.utime(cache_file, (stat.st_atime, stat.st_mtime - age))
+
+
+def test_fetch_uncached(ptex: Ptex, fetch_log: Path) -> None:
+    assert "https://example.org/a #1" == ptex.fetch_text("https://example.org/a")
+    assert "https://example.org/a #2" == ptex.fetch_text("https://example.org/a")
+    assert ["https://example.org/a"] * 2 == fetches(fetch_log)
+    assert ptex._cache_dir is not None
+    assert not ptex._cache_dir.exists()
+
+
+def test_fetch_cached_ttl(ptex: Ptex, fetch_log: Path) -> None:
+    assert "https://example.org/a #1" == ptex.fetch_cached_text("https://example.org/a", ttl=60)
+    assert "https://example.org/a #1" == ptex.fetch_cached_text("https://example.org/a", ttl=60)
+    assert ["https://example.org/a"] == fetches(fetch_log)
+
+    expire_cache(ptex, age=61)
+    assert "https://example.org/a #2" == ptex.fetch_cached_text("https://example.org/a", ttl=60)
+    assert "https://example.org/a #2" == ptex.fetch_cached_text("https://example.org/a", ttl=60)
+    assert ["https://example.org/a"] * 2 == fetches(fetch_log)
+
+
+def test_fetch_cached_forever(ptex: Ptex, fetch_log: Path) -> None:
+    url = "https://example.org/a"
+    assert f"{url} #1" == ptex.fetch_cached_text(url, ttl=CACHE_FOREVER)
+    expire_cache(ptex, age=10 * 365 * 24 * 60 * 60)
+    assert f"{url} #1" == ptex.fetch_cached_text(url, ttl=CACHE_FOREVER)
+    assert [url] == fetches(fetch_log)
+
+
+def test_fetch_cached_failure(ptex: Ptex, fetch_log: Path) -> None:
+    with pytest.raises(CalledProcessError):
+        ptex.fetch_cached_text("https://example.org/fail", ttl=CACHE_FOREVER)
+    assert ptex._cache_dir is not None
+    assert not ptex._cache_dir.exists() or not list(ptex._cache_dir.iterdir())
+
+    with pytest.raises(CalledProcessError):
+        ptex.fetch_cached_text("https://example.org/fail", ttl=CACHE_FOREVER)
+    assert ["https://example.org/fail"] * 2 == fetches(fetch_log)
+
+
+def test_fetch_many(ptex: Ptex, fetch_log: Path) -> None:
+    urls = ["https://example.org/a", "https://example.org/b"]
+    # N.B.: The fetches run concurrently; so the order in which they are counted is unspecified.
+    a, b = ptex.fetch_many(*urls)
+    assert a.startswith(b"https://example.org/a #")
+    assert b.startswith(b"https://example.org/b #")
+    assert sorted(urls) == sorted(fetches(fetch_log))
+    assert ptex._cache_dir is not None
+    assert not ptex._cache_dir.exists()
+
+
+def test_fetch_many_failure(ptex: Ptex, monkeypatch: pytest.MonkeyPatch) -> None:
+    processes = []
+
+    class RecordingPopen(subprocess.Popen):
+        def __init__(self, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+            processes.append(self)
+
+    monkeypatch.setattr(subprocess, "Popen", RecordingPopen)
+    with pytest.raises(CalledProcessError):
+        ptex.fetch_many("https://example.org/fail", "https://example.org/hang")
+
+    fail, hang = processes
+    assert 1 == fail.returncode
+    assert -signal.SIGKILL == hang.returncode
+
+
+def test_fetch_to_fp_with_sha256(ptex: Ptex, tmp_path: Path) -> None:
+    dest = tmp_path / "dest"
+    with dest.open("wb") as fp:
+        sha256 = ptex.fetch_to_fp_with_sha256("https://example.org/a", fp)
+    assert b"https://example.org/a #1" == dest.read_bytes()
+    assert hashlib.sha256(dest.read_bytes()).hexdigest() == sha256
+
+    with dest.open("wb") as fp, pytest.raises(CalledProcessError):
+        ptex.fetch_to_fp_with_sha256("https://example.org/fail", fp)